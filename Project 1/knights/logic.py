@@ -1,7 +1,56 @@
+import collections
+import cProfile
+import functools
+import heapq
 import itertools
+import json
+import pstats
+import re
+import time
+import weakref
 
 
 class Sentence():
+    """
+    Base class for logical sentences.
+
+    Sentences are immutable and hash-consed: constructing a sentence that is
+    structurally equal to one that already exists returns the existing node,
+    so equality is identity and hashes and symbol sets are computed once.
+    """
+
+    __slots__ = ("_hash", "_symbols", "__weakref__")
+
+    # Interning table mapping (class, *structure) keys to shared nodes
+    _interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def _node(cls, key, fields, symbols):
+        """
+        Returns the interned node for `key`, building it from `fields`
+        (attribute name -> value) and `symbols` if it does not exist yet.
+        """
+        node = Sentence._interned.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            for name, value in fields.items():
+                object.__setattr__(node, name, value)
+            object.__setattr__(node, "_hash", hash(key[1:]))
+            object.__setattr__(node, "_symbols", frozenset(symbols))
+            Sentence._interned[key] = node
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError("logical sentences are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("logical sentences are immutable")
+
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return self._hash
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -12,8 +61,8 @@ class Sentence():
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozen set of all symbols in the logical sentence."""
+        return frozenset()
 
     @classmethod
     def validate(cls, sentence):
@@ -44,14 +93,15 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ("name",)
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+    def __new__(cls, name):
+        return cls._node(
+            (cls, "symbol", name), {"name": name}, (name,)
+        )
 
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -66,19 +116,21 @@ class Symbol(Sentence):
         return self.name
 
     def symbols(self):
-        return {self.name}
+        return self._symbols
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    __slots__ = ("operand",)
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls._node(
+            (cls, "not", operand), {"operand": operand}, operand._symbols
+        )
+
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -90,23 +142,24 @@ class Not(Sentence):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
     def symbols(self):
-        return self.operand.symbols()
+        return self._symbols
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
-        for conjunct in conjuncts:
-            Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+    __slots__ = ("conjuncts",)
 
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+    def __new__(cls, *conjuncts):
+        for conjunct in conjuncts:
+            Sentence.validate(conjunct)
+        return cls._node(
+            (cls, "and", conjuncts), {"conjuncts": conjuncts},
+            frozenset().union(*[conjunct._symbols for conjunct in conjuncts])
         )
 
+    def __reduce__(self):
+        return (And, self.conjuncts)
+
     def __repr__(self):
         conjunctions = ", ".join(
             [str(conjunct) for conjunct in self.conjuncts]
@@ -114,36 +167,45 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        """
+        Sentences are immutable, so a conjunction cannot grow in place.
+        Raises TypeError rather than silently dropping `conjunct`.
+        """
+        raise TypeError(
+            "And is immutable; use And(*sentence.conjuncts, conjunct) "
+            "for a conjunction with another conjunct"
+        )
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
     def formula(self):
+        if len(self.conjuncts) == 0:
+            return "⊤"
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        return self._symbols
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
-        for disjunct in disjuncts:
-            Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+    __slots__ = ("disjuncts",)
 
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+    def __new__(cls, *disjuncts):
+        for disjunct in disjuncts:
+            Sentence.validate(disjunct)
+        return cls._node(
+            (cls, "or", disjuncts), {"disjuncts": disjuncts},
+            frozenset().union(*[disjunct._symbols for disjunct in disjuncts])
         )
 
+    def __reduce__(self):
+        return (Or, self.disjuncts)
+
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
@@ -152,29 +214,32 @@ class Or(Sentence):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
     def formula(self):
+        if len(self.disjuncts) == 0:
+            return "⊥"
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return self._symbols
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return cls._node(
+            (cls, "implies", antecedent, consequent),
+            {"antecedent": antecedent, "consequent": consequent},
+            antecedent._symbols | consequent._symbols
+        )
 
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -189,23 +254,24 @@ class Implication(Sentence):
         return f"{antecedent} => {consequent}"
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        return self._symbols
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        return cls._node(
+            (cls, "biconditional", left, right),
+            {"left": left, "right": right},
+            left._symbols | right._symbols
+        )
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -217,14 +283,143 @@ class Biconditional(Sentence):
                     and not self.right.evaluate(model)))
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
+        return self._symbols
+
+
+# Active Profiler, if any; instrumentation is skipped entirely when None
+_profiler = None
+
+
+class Profiler():
+    """
+    Records where the logic engine spends its time.
+
+    While started (or used as a context manager), counts models enumerated,
+    models and branches pruned per engine, evaluate() calls per sentence
+    type, and the time and result of every query. Counting evaluate() calls
+    patches the sentence classes only while the profiler is running, so a
+    stopped profiler costs nothing. With `cprofile=True`, a cProfile
+    profile is collected as well and can be saved with `dump_stats`.
+    """
+
+    def __init__(self, cprofile=False):
+        self.models = 0
+        self.pruned = dict()
+        self.evaluations = dict()
+        self.queries = []
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._originals = dict()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Starts recording; only one profiler can record at a time."""
+        global _profiler
+        if _profiler is not None:
+            raise Exception("a profiler is already running")
+        _profiler = self
+        for cls in (Symbol, Not, And, Or, Implication, Biconditional):
+            self._originals[cls] = cls.evaluate
+            cls.evaluate = self._counting(cls.__name__, cls.evaluate)
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self):
+        """
+        Stops recording and restores the uninstrumented engine. Does
+        nothing unless this profiler is the one recording.
+        """
+        global _profiler
+        if _profiler is not self:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        for cls, evaluate in self._originals.items():
+            cls.evaluate = evaluate
+        self._originals = dict()
+        _profiler = None
+
+    def to_dict(self):
+        """Returns the recorded statistics as a dict."""
+        return {
+            "models": self.models,
+            "pruned": dict(self.pruned),
+            "evaluations": dict(self.evaluations),
+            "queries": list(self.queries),
+            "total_seconds": sum(query["seconds"] for query in self.queries)
+        }
+
+    def to_json(self, indent=None):
+        """Returns the recorded statistics as JSON text."""
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    def stats(self):
+        """Returns the cProfile data as a `pstats.Stats` object."""
+        if self._cprofile is None:
+            raise Exception("profiler was not created with cprofile=True")
+        return pstats.Stats(self._cprofile)
+
+    def dump_stats(self, filename):
+        """Saves the cProfile data in the format read by pstats."""
+        self.stats().dump_stats(filename)
+
+    def _counting(self, name, evaluate):
+        evaluations = self.evaluations
+        evaluations.setdefault(name, 0)
+
+        def counting_evaluate(sentence, model):
+            evaluations[name] += 1
+            return evaluate(sentence, model)
+        return counting_evaluate
+
+    def _prune(self, engine, count=1):
+        self.pruned[engine] = self.pruned.get(engine, 0) + count
+
+    def _record(self, engine, query, seconds, result):
+        self.queries.append({
+            "engine": engine,
+            "query": query.formula() if query is not None else None,
+            "seconds": seconds,
+            "result": (result if isinstance(result, (bool, int))
+                       else result is not None)
+        })
+
+
+def _instrumented(engine, has_query=True):
+    """
+    Decorates a query function to record its time with the profiler.
+    The query is the function's last argument, or None without `has_query`.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            profiler = _profiler
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            query = None
+            if has_query:
+                query = kwargs.get("query", args[-1] if args else None)
+            profiler._record(
+                engine, query, time.perf_counter() - start, result
+            )
+            return result
+        return wrapper
+    return decorator
+
+
+@_instrumented("model_check")
 def model_check(knowledge, query):
     """Checks if knowledge base entails query."""
 
@@ -233,10 +428,14 @@ def model_check(knowledge, query):
 
         # If model has an assignment for each symbol
         if not symbols:
+            if _profiler is not None:
+                _profiler.models += 1
 
             # If knowledge base is true in model, then query must also be true
             if knowledge.evaluate(model):
                 return query.evaluate(model)
+            if _profiler is not None:
+                _profiler._prune("model_check")
             return True
         else:
 
@@ -257,7 +456,842 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+# Constants used by the simplifier: an empty conjunction is always true,
+# and an empty disjunction is always false
+TRUE = And()
+FALSE = Or()
+
+
+def size(sentence):
+    """Returns the number of nodes in the sentence tree."""
+    if isinstance(sentence, Symbol):
+        return 1
+    if isinstance(sentence, Not):
+        return 1 + size(sentence.operand)
+    if isinstance(sentence, And):
+        return 1 + sum(size(conjunct) for conjunct in sentence.conjuncts)
+    if isinstance(sentence, Or):
+        return 1 + sum(size(disjunct) for disjunct in sentence.disjuncts)
+    if isinstance(sentence, Implication):
+        return 1 + size(sentence.antecedent) + size(sentence.consequent)
+    if isinstance(sentence, Biconditional):
+        return 1 + size(sentence.left) + size(sentence.right)
+    raise TypeError("must be a logical sentence")
+
+
+def is_literal(sentence):
+    """Checks if a sentence is a symbol or a negated symbol."""
+    return isinstance(sentence, Symbol) or (
+        isinstance(sentence, Not) and isinstance(sentence.operand, Symbol)
+    )
+
+
+def negate(sentence):
+    """Returns the negation of a sentence, cancelling double negations."""
+    if isinstance(sentence, Not):
+        return sentence.operand
+    if sentence is TRUE:
+        return FALSE
+    if sentence is FALSE:
+        return TRUE
+    return Not(sentence)
+
+
+def simplify(sentence):
+    """
+    Returns an equivalent, usually much smaller, form of `sentence`.
+
+    Implications and biconditionals are eliminated, negations are pushed
+    down to the symbols, nested conjunctions and disjunctions are flattened
+    with duplicates removed, constants are folded and unit literals of each
+    conjunction are propagated into their sibling conjuncts.
+    """
+    return _propagate(_normalize(sentence, True, dict()), dict())
+
+
+def simplify_report(sentence):
+    """
+    Simplifies `sentence` and returns a dict with the simplified
+    sentence and its size before and after simplification.
+    """
+    simplified = simplify(sentence)
+    return {
+        "sentence": simplified,
+        "before": size(sentence),
+        "after": size(simplified)
+    }
+
+
+def _normalize(sentence, positive, cache):
+    """
+    Returns `sentence` (or its negation, if not `positive`) in flattened
+    negation normal form, using only Symbol, Not, And and Or.
+    """
+    key = (sentence, positive)
+    if key in cache:
+        return cache[key]
+
+    if isinstance(sentence, Symbol):
+        result = sentence if positive else Not(sentence)
+    elif isinstance(sentence, Not):
+        result = _normalize(sentence.operand, not positive, cache)
+    elif isinstance(sentence, (And, Or)):
+        children = (sentence.conjuncts if isinstance(sentence, And)
+                    else sentence.disjuncts)
+        conjunction = isinstance(sentence, And) == positive
+        result = _combine(conjunction, [
+            _normalize(child, positive, cache) for child in children
+        ])
+    elif isinstance(sentence, Implication):
+        result = _normalize(
+            Or(Not(sentence.antecedent), sentence.consequent),
+            positive, cache
+        )
+    elif isinstance(sentence, Biconditional):
+        left, right = sentence.left, sentence.right
+        result = _normalize(
+            And(Or(Not(left), right), Or(left, Not(right))),
+            positive, cache
+        )
+    else:
+        raise TypeError("must be a logical sentence")
+
+    cache[key] = result
+    return result
+
+
+def _combine(conjunction, children, absorb=False):
+    """
+    Builds a flattened And (if `conjunction`) or Or of `children`,
+    removing duplicates and folding constants and complementary literals,
+    and, if `absorb`, children absorbed by a sibling.
+    """
+    kind = And if conjunction else Or
+    identity, absorbing = (TRUE, FALSE) if conjunction else (FALSE, TRUE)
+
+    flat = dict()
+    stack = list(reversed(children))
+    while stack:
+        child = stack.pop()
+        if child is absorbing:
+            return absorbing
+        if child is identity:
+            continue
+        if isinstance(child, kind):
+            stack.extend(reversed(
+                child.conjuncts if conjunction else child.disjuncts
+            ))
+            continue
+        if negate(child) in flat:
+            return absorbing
+        flat[child] = None
+
+    flat = _absorb(conjunction, flat) if absorb else list(flat)
+    if len(flat) == 1:
+        return flat[0]
+    return kind(*flat)
+
+
+def _absorb(conjunction, children):
+    """
+    Returns `children` without any child implied by (or implying) a
+    sibling whose literals are a strict subset of its own. Each child is
+    indexed under its literal that the fewest siblings share, so a child
+    is only compared with the siblings indexed under its own literals.
+    """
+    other = Or if conjunction else And
+    parts = {
+        child: frozenset(child.disjuncts if conjunction else child.conjuncts)
+        if isinstance(child, other) else frozenset((child,))
+        for child in children
+    }
+    counts = collections.Counter(
+        part for literals in parts.values() for part in literals
+    )
+    index = dict()
+    for child, literals in parts.items():
+        index.setdefault(min(literals, key=counts.__getitem__), []).append(child)
+    return [child for child in children if not any(
+        parts[sibling] < parts[child]
+        for part in parts[child] for sibling in index.get(part, ())
+    )]
+
+
+def _propagate(sentence, cache):
+    """
+    Propagates the unit literals of every conjunction in a normalized
+    sentence into the other conjuncts, until no more units are found.
+    """
+    if sentence in cache:
+        return cache[sentence]
+
+    if isinstance(sentence, Or):
+        result = _combine(False, [
+            _propagate(disjunct, cache) for disjunct in sentence.disjuncts
+        ], absorb=True)
+    elif isinstance(sentence, And):
+        result = _propagate_conjuncts([
+            _propagate(conjunct, cache) for conjunct in sentence.conjuncts
+        ])
+    else:
+        result = sentence
+
+    cache[sentence] = result
+    return result
+
+
+def _propagate_conjuncts(conjuncts):
+    """
+    Conjoins normalized `conjuncts` and propagates their unit literals
+    into the others. Units wait in a queue, and an index from each symbol
+    name to the conjuncts that mention it means each unit only revisits
+    the conjuncts it can change.
+    """
+    assignment = dict()
+    literals = []
+    rest = []
+    index = dict()
+    queue = collections.deque()
+
+    def add(conjunct):
+        """Adds `conjunct`, returning False if it contradicts the units."""
+        stack = [conjunct]
+        while stack:
+            conjunct = stack.pop()
+            if conjunct is FALSE:
+                return False
+            if isinstance(conjunct, And):
+                stack.extend(reversed(conjunct.conjuncts))
+            elif is_literal(conjunct):
+                value = isinstance(conjunct, Symbol)
+                name = conjunct.name if value else conjunct.operand.name
+                if name not in assignment:
+                    assignment[name] = value
+                    literals.append(conjunct)
+                    queue.append(name)
+                elif assignment[name] != value:
+                    return False
+            else:
+                for name in conjunct._symbols:
+                    index.setdefault(name, []).append(len(rest))
+                rest.append(conjunct)
+        return True
+
+    if not all(add(conjunct) for conjunct in conjuncts):
+        return FALSE
+    changed = False
+    while queue:
+        for position in index.pop(queue.popleft(), ()):
+            conjunct = rest[position]
+            if conjunct is None:
+                continue
+            rest[position] = None
+            changed = True
+            if not add(_assign(conjunct, assignment, dict())):
+                return FALSE
+
+    # Units go first once they have changed the other conjuncts
+    if not changed:
+        return _combine(True, conjuncts, absorb=True)
+    return _combine(True, literals + [
+        conjunct for conjunct in rest if conjunct is not None
+    ], absorb=True)
+
+
+def _assign(sentence, assignment, cache):
+    """
+    Substitutes the truth values in `assignment` (symbol name -> bool)
+    into a normalized sentence and folds the resulting constants.
+    """
+    if sentence in cache:
+        return cache[sentence]
+
+    if isinstance(sentence, Symbol):
+        result = sentence
+        if sentence.name in assignment:
+            result = TRUE if assignment[sentence.name] else FALSE
+    elif isinstance(sentence, Not):
+        result = negate(_assign(sentence.operand, assignment, cache))
+    elif isinstance(sentence, And):
+        result = _combine(True, [
+            _assign(conjunct, assignment, cache)
+            for conjunct in sentence.conjuncts
+        ], absorb=True)
+    elif isinstance(sentence, Or):
+        result = _combine(False, [
+            _assign(disjunct, assignment, cache)
+            for disjunct in sentence.disjuncts
+        ], absorb=True)
+    else:
+        result = sentence
+
+    cache[sentence] = result
+    return result
+
+
+def to_cnf(sentence):
+    """
+    Converts a sentence to conjunctive normal form, returned as a set of
+    clauses. Each clause is a frozenset of (symbol name, truth value)
+    literals; tautological clauses are left out.
+    """
+    return _clauses(_normalize(sentence, True, dict()), dict())
+
+
+def clause_sentence(clause):
+    """Returns the disjunction of literals that a clause represents."""
+    return Or(*[
+        Symbol(name) if value else Not(Symbol(name))
+        for name, value in sorted(clause)
+    ])
+
+
+def resolution_check(knowledge, query):
+    """Checks if knowledge base entails query, using resolution."""
+    return resolution_proof(knowledge, query) is not None
+
+
+@_instrumented("resolution")
+def resolution_proof(knowledge, query):
+    """
+    Searches for a resolution refutation of `knowledge` ∧ ¬`query`.
+
+    Uses the set-of-support strategy (every resolvent descends from the
+    negated query), discards subsumed clauses and finds resolution
+    partners through a literal -> clause index.
+    Returns None if the query is not entailed, otherwise the proof as a
+    list of (clause, source, parents) steps ending in the empty clause,
+    where clause is a disjunction, source is "knowledge", "query" or
+    "resolution" and parents are indices of earlier steps.
+    As with any set-of-support search, the knowledge base itself is
+    assumed to be satisfiable.
+    """
+    clauses = dict()
+    archive = dict()
+    origins = dict()
+    occurs = dict()
+    processed = set()
+    support = []
+    counter = itertools.count()
+
+    def subsumed(clause):
+        """Checks if a kept clause is a subset of `clause`."""
+        for literal in clause:
+            for i in occurs.get(literal, ()):
+                if clauses[i] <= clause:
+                    return True
+        return False
+
+    def keep(clause, origin):
+        """Adds a clause, removing kept clauses that it subsumes."""
+        if clause:
+            supersets = set.intersection(*[
+                occurs.get(literal, set()) for literal in clause
+            ])
+            for i in supersets:
+                for literal in clauses.pop(i):
+                    occurs[literal].discard(i)
+                processed.discard(i)
+        i = next(counter)
+        clauses[i] = archive[i] = clause
+        origins[i] = origin
+        for literal in clause:
+            occurs.setdefault(literal, set()).add(i)
+        return i
+
+    for clause in to_cnf(knowledge):
+        if not subsumed(clause):
+            processed.add(keep(clause, ("knowledge", ())))
+    for clause in to_cnf(Not(query)):
+        if not subsumed(clause):
+            i = keep(clause, ("query", ()))
+            heapq.heappush(support, (len(clause), i))
+
+    # Given-clause loop: resolve the shortest supported clause against
+    # every processed clause containing a complementary literal
+    empty = next((i for i, clause in clauses.items() if not clause), None)
+    while empty is None and support:
+        _, given = heapq.heappop(support)
+        if given not in clauses:
+            continue
+        clause = clauses[given]
+        processed.add(given)
+        for name, value in clause:
+            for other in list(occurs.get((name, not value), ())):
+                if other not in processed or other not in clauses:
+                    continue
+                resolvent = ((clause - {(name, value)})
+                             | (clauses[other] - {(name, not value)}))
+                if any((n, not v) in resolvent for n, v in resolvent):
+                    continue
+                if subsumed(resolvent):
+                    if _profiler is not None:
+                        _profiler._prune("resolution")
+                    continue
+                i = keep(resolvent, ("resolution", (given, other)))
+                if not resolvent:
+                    empty = i
+                    break
+                heapq.heappush(support, (len(resolvent), i))
+            if empty is not None or given not in clauses:
+                break
+
+    if empty is None:
+        return None
+
+    # Collect the clauses the refutation depends on, parents first
+    order = []
+    seen = set()
+    stack = [(empty, False)]
+    while stack:
+        i, expanded = stack.pop()
+        if expanded:
+            order.append(i)
+            continue
+        if i in seen:
+            continue
+        seen.add(i)
+        stack.append((i, True))
+        for parent in origins[i][1]:
+            stack.append((parent, False))
+    step = {i: n for n, i in enumerate(order)}
+    return [
+        (clause_sentence(archive[i]), origins[i][0],
+         tuple(step[parent] for parent in origins[i][1]))
+        for i in order
+    ]
+
+
+def _clauses(sentence, cache):
+    """Distributes a normalized sentence into a set of clauses."""
+    if sentence in cache:
+        return cache[sentence]
+
+    if isinstance(sentence, Symbol):
+        result = {frozenset(((sentence.name, True),))}
+    elif isinstance(sentence, Not):
+        result = {frozenset(((sentence.operand.name, False),))}
+    elif isinstance(sentence, And):
+        result = set().union(*[
+            _clauses(conjunct, cache) for conjunct in sentence.conjuncts
+        ])
+    else:
+        result = {frozenset()}
+        for disjunct in sentence.disjuncts:
+            result = {
+                left | right
+                for left in result
+                for right in _clauses(disjunct, cache)
+                if not any((n, not v) in left for n, v in right)
+            }
+
+    cache[sentence] = result
+    return result
+
+
+@_instrumented("count_models", has_query=False)
+def count_models(knowledge, symbols=None):
+    """
+    Returns the number of models, over the symbols of `knowledge` and
+    any extra symbol names in `symbols`, in which `knowledge` is true.
+    """
+    names = set(knowledge.symbols()) | set(symbols or ())
+    clauses = frozenset(to_cnf(knowledge))
+    return _count(clauses, frozenset(names), dict())
+
+
+def models(knowledge, symbols=None):
+    """
+    Generates every model (dict of symbol name -> bool), over the symbols
+    of `knowledge` and any extra symbol names in `symbols`, in which
+    `knowledge` is true.
+    """
+    names = frozenset(set(knowledge.symbols()) | set(symbols or ()))
+    clauses = frozenset(to_cnf(knowledge))
+    yield from _enumerate(clauses, names, dict(), dict())
+
+
+def _condition(clauses, literal):
+    """Simplifies clauses under the assumption that `literal` is true."""
+    name, value = literal
+    return frozenset(
+        clause - {(name, not value)}
+        for clause in clauses if literal not in clause
+    )
+
+
+def _propagate_units(clauses, assignment):
+    """
+    Assigns every unit clause, recording values in `assignment`.
+    Returns the simplified clauses, or None if a conflict is found.
+    """
+    while True:
+        if frozenset() in clauses:
+            return None
+        unit = next((clause for clause in clauses if len(clause) == 1), None)
+        if unit is None:
+            return clauses
+        literal, = unit
+        assignment[literal[0]] = literal[1]
+        clauses = _condition(clauses, literal)
+
+
+def _components(clauses):
+    """Splits clauses into groups that share no symbols."""
+    parent = dict()
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    for clause in clauses:
+        names = [name for name, _ in clause]
+        for name in names:
+            parent.setdefault(name, name)
+        for name in names[1:]:
+            parent[find(name)] = find(names[0])
+
+    groups = dict()
+    for clause in clauses:
+        name = next(iter(clause))[0]
+        groups.setdefault(find(name), set()).add(clause)
+    return [frozenset(group) for group in groups.values()]
+
+
+def _branch_symbol(clauses):
+    """Chooses the symbol occurring in the most clauses."""
+    counts = dict()
+    for clause in clauses:
+        for name, _ in clause:
+            counts[name] = counts.get(name, 0) + 1
+    return max(counts, key=counts.get)
+
+
+def _count(clauses, names, cache):
+    """Counts models of clauses over the symbol names in `names`."""
+    assignment = dict()
+    clauses = _propagate_units(clauses, assignment)
+    if clauses is None:
+        return 0
+    names = names - assignment.keys()
+    used = {name for clause in clauses for name, _ in clause}
+    total = 2 ** len(names - used)
+    for component in _components(clauses):
+        if component not in cache:
+            p = _branch_symbol(component)
+            inner = frozenset(name for clause in component
+                              for name, _ in clause)
+            cache[component] = sum(
+                _count(_condition(component, (p, value)), inner - {p}, cache)
+                for value in (True, False)
+            )
+        total *= cache[component]
+        if not total:
+            return 0
+    return total
+
+
+def _enumerate(clauses, names, model, cache):
+    """Generates models of clauses extending the partial `model`."""
+    model = model.copy()
+    clauses = _propagate_units(clauses, model)
+    if clauses is None:
+        return
+    names = names - model.keys()
+    if not clauses:
+        free = sorted(names)
+        for values in itertools.product((True, False), repeat=len(free)):
+            if _profiler is not None:
+                _profiler.models += 1
+            yield {**model, **dict(zip(free, values))}
+        return
+    p = _branch_symbol(clauses)
+    for value in (True, False):
+        branch = _condition(clauses, (p, value))
+        rest = names - {p}
+        if _count(branch, rest, cache):
+            yield from _enumerate(branch, rest, {**model, p: value}, cache)
+        elif _profiler is not None:
+            _profiler._prune("models")
+
+
+class KnowledgeBase():
+    """
+    Incremental knowledge base supporting assertion and retraction.
+
+    Sentences are converted to clauses once, literals implied by unit
+    propagation and literals proven by earlier queries are kept as learned
+    clauses, and entailment answers are cached by knowledge base version.
+    Because entailment is monotonic, positive answers and learned literals
+    survive new assertions; only a retraction discards them.
+    """
+
+    def __init__(self, *sentences):
+        self.version = 0
+        self._sentences = dict()
+        self._cnf = dict()
+        self._learned = set()
+        self._answers = dict()
+        self._clauses = None
+        self._stale = True
+        for sentence in sentences:
+            self.add(sentence)
+
+    def __len__(self):
+        return len(self._sentences)
+
+    def __contains__(self, sentence):
+        return sentence in self._sentences
+
+    @property
+    def sentences(self):
+        """Returns the asserted sentences, in order of assertion."""
+        return tuple(self._sentences)
+
+    @property
+    def knowledge(self):
+        """Returns the conjunction of all asserted sentences."""
+        return And(*self._sentences)
+
+    def add(self, sentence):
+        """Asserts a sentence. Asserting a known sentence has no effect."""
+        Sentence.validate(sentence)
+        if sentence in self._sentences:
+            return
+        self._sentences[sentence] = None
+        if sentence not in self._cnf:
+            self._cnf[sentence] = frozenset(to_cnf(sentence))
+        self.version += 1
+        self._stale = True
+
+        # Keep positive answers, which stay true as knowledge grows
+        self._answers = {
+            query: (self.version, True)
+            for query, (_, answer) in self._answers.items() if answer
+        }
+
+    def retract(self, sentence):
+        """Retracts a previously asserted sentence."""
+        if sentence not in self._sentences:
+            raise KeyError(f"{sentence} not in knowledge base")
+        del self._sentences[sentence]
+        self.version += 1
+        self._stale = True
+        self._learned = set()
+        self._answers = dict()
+
+    def implied(self):
+        """
+        Returns the set of (symbol name, truth value) literals implied by
+        unit propagation and by earlier queries, or None if the knowledge
+        base is inconsistent.
+        """
+        clauses = self._current_clauses()
+        if clauses is None:
+            return None
+        return set(self._learned)
+
+    @_instrumented("knowledge_base")
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        Sentence.validate(query)
+        cached = self._answers.get(query)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+
+        clauses = self._current_clauses()
+        if clauses is None:
+            answer = True
+        elif is_literal(query) and self._literal(query) in self._learned:
+            answer = True
+        else:
+            answer = not _satisfiable(clauses | to_cnf(Not(query)))
+            if answer and is_literal(query):
+                self._learned.add(self._literal(query))
+                self._stale = True
+
+        self._answers[query] = (self.version, answer)
+        return answer
+
+    @staticmethod
+    def _literal(sentence):
+        if isinstance(sentence, Symbol):
+            return (sentence.name, True)
+        return (sentence.operand.name, False)
+
+    def _current_clauses(self):
+        """
+        Returns the clauses of all asserted sentences plus learned unit
+        clauses, simplified by unit propagation, or None on a conflict.
+        """
+        if self._stale:
+            clauses = frozenset().union(*[
+                self._cnf[sentence] for sentence in self._sentences
+            ], [frozenset((literal,)) for literal in self._learned])
+            assignment = dict()
+            clauses = _propagate_units(clauses, assignment)
+            if clauses is not None:
+                self._learned.update(assignment.items())
+                clauses |= {frozenset((literal,))
+                            for literal in self._learned}
+            self._clauses = clauses
+            self._stale = False
+        return self._clauses
+
+
+def _satisfiable(clauses):
+    """Checks if a set of clauses has a model, using DPLL."""
+    clauses = _propagate_units(clauses, dict())
+    if clauses is None:
+        return False
+    if not clauses:
+        return True
+    p = _branch_symbol(clauses)
+    return any(
+        _satisfiable(_condition(clauses, (p, value)))
+        for value in (True, False)
+    )
+
+
+# Tokens of the formula syntax, with ASCII aliases for each operator
+_TOKEN = re.compile(r"<=>|<->|=>|->|[¬~!∧&∨|()⊤⊥]")
+_ALIASES = {
+    "~": "¬", "!": "¬", "&": "∧", "|": "∨", "->": "=>", "<->": "<=>"
+}
+
+
+def parse(text):
+    """
+    Parses a formula, as produced by `Sentence.formula`, into a sentence.
+
+    Accepts ¬, ∧, ∨, =>, <=> (and the ASCII aliases ~ or !, &, |, ->, <->),
+    parentheses and the constants ⊤ and ⊥. Without parentheses, ¬ binds
+    tightest, followed by ∧, ∨, => (right-associative) and <=>.
+    Any other run of text is a symbol name, with surrounding whitespace
+    stripped, so `parse(s.formula())` rebuilds `s` for any sentence whose
+    symbol names contain no operators or parentheses (single-operand
+    conjunctions and disjunctions come back as their operand).
+    """
+    tokens = _tokenize(text)
+    if not tokens:
+        raise ValueError("empty formula")
+    sentence, position = _parse_biconditional(tokens, 0)
+    if position != len(tokens):
+        raise ValueError(f"unexpected {tokens[position][1]!r} in formula")
+    return sentence
+
+
+def iter_sentences(lines):
+    """
+    Lazily parses an iterable of lines (such as an open file) into
+    sentences, one per line, skipping blank lines and # comments.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield parse(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+
+
+def load_knowledge(filename):
+    """
+    Loads a knowledge base written one formula per line, returning
+    the conjunction of all of its sentences.
+    """
+    with open(filename, encoding="utf-8") as f:
+        return And(*iter_sentences(f))
+
+
+def save_knowledge(knowledge, filename):
+    """
+    Saves a knowledge base one formula per line. If `knowledge` is a
+    conjunction, each conjunct is written on its own line.
+    """
+    sentences = (knowledge.conjuncts if isinstance(knowledge, And)
+                 else (knowledge,))
+    with open(filename, "w", encoding="utf-8") as f:
+        for sentence in sentences:
+            f.write(sentence.formula() + "\n")
+
+
+def _tokenize(text):
+    """
+    Splits formula text into a list of ("op", operator) and
+    ("symbol", name) tokens.
+    """
+    tokens = []
+    position = 0
+    for match in _TOKEN.finditer(text):
+        name = text[position:match.start()].strip()
+        if name:
+            tokens.append(("symbol", name))
+        operator = match.group()
+        tokens.append(("op", _ALIASES.get(operator, operator)))
+        position = match.end()
+    name = text[position:].strip()
+    if name:
+        tokens.append(("symbol", name))
+    return tokens
+
+
+def _parse_biconditional(tokens, position):
+    left, position = _parse_implication(tokens, position)
+    if position < len(tokens) and tokens[position] == ("op", "<=>"):
+        right, position = _parse_biconditional(tokens, position + 1)
+        return Biconditional(left, right), position
+    return left, position
+
+
+def _parse_implication(tokens, position):
+    antecedent, position = _parse_nary(tokens, position, "∨")
+    if position < len(tokens) and tokens[position] == ("op", "=>"):
+        consequent, position = _parse_implication(tokens, position + 1)
+        return Implication(antecedent, consequent), position
+    return antecedent, position
+
+
+def _parse_nary(tokens, position, operator):
+    """Parses a chain of ∨ (or ∧) operands into a single Or (or And)."""
+    parse_operand = (_parse_unary if operator == "∧"
+                     else lambda tokens, position:
+                     _parse_nary(tokens, position, "∧"))
+    operand, position = parse_operand(tokens, position)
+    operands = [operand]
+    while position < len(tokens) and tokens[position] == ("op", operator):
+        operand, position = parse_operand(tokens, position + 1)
+        operands.append(operand)
+    if len(operands) == 1:
+        return operand, position
+    return (And if operator == "∧" else Or)(*operands), position
+
+
+def _parse_unary(tokens, position):
+    if position >= len(tokens):
+        raise ValueError("unexpected end of formula")
+    kind, value = tokens[position]
+    if kind == "symbol":
+        return Symbol(value), position + 1
+    if value == "¬":
+        operand, position = _parse_unary(tokens, position + 1)
+        return Not(operand), position
+    if value == "⊤":
+        return And(), position + 1
+    if value == "⊥":
+        return Or(), position + 1
+    if value == "(":
+        sentence, position = _parse_biconditional(tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ("op", ")"):
+            raise ValueError("missing closing parenthesis")
+        return sentence, position + 1
+    raise ValueError(f"unexpected {value!r} in formula")
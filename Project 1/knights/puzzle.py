@@ -84,6 +84,7 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            knowledge = simplify(knowledge)
             for symbol in symbols:
                 if model_check(knowledge, symbol):
                     print(f"    {symbol}")
@@ -0,0 +1,88 @@
+import itertools
+import random
+
+from logic import *
+
+
+# Random sentences over a few symbols, checked against their truth tables
+NAMES = ["a", "b", "c", "d"]
+MODELS = [
+    dict(zip(NAMES, values))
+    for values in itertools.product([False, True], repeat=len(NAMES))
+]
+
+
+def random_sentence(rng, depth=3):
+    """Returns a random sentence over NAMES, nested at most `depth` deep."""
+    if depth == 0 or rng.random() < 0.2:
+        symbol = Symbol(rng.choice(NAMES))
+        return Not(symbol) if rng.random() < 0.5 else symbol
+    kind = rng.randrange(5)
+    if kind == 0:
+        return Not(random_sentence(rng, depth - 1))
+    if kind in (1, 2):
+        operands = [random_sentence(rng, depth - 1)
+                    for _ in range(rng.randrange(4))]
+        return And(*operands) if kind == 1 else Or(*operands)
+    left, right = random_sentence(rng, depth - 1), random_sentence(rng, depth - 1)
+    return Implication(left, right) if kind == 3 else Biconditional(left, right)
+
+
+def truth_table(sentence):
+    """Returns the indices of the models in MODELS where `sentence` holds."""
+    return {i for i, model in enumerate(MODELS) if sentence.evaluate(model)}
+
+
+rng = random.Random(0)
+
+for _ in range(300):
+    sentence = random_sentence(rng)
+    clauses = to_cnf(sentence)
+    assert truth_table(sentence) == {
+        i for i, model in enumerate(MODELS)
+        if all(any(model[name] == value for name, value in clause)
+               for clause in clauses)
+    }, sentence
+print("to_cnf ok")
+
+for _ in range(300):
+    knowledge, query = random_sentence(rng), random_sentence(rng, 2)
+    entailed = truth_table(knowledge) <= truth_table(query)
+    assert resolution_check(knowledge, query) == entailed, (knowledge, query)
+print("resolution ok")
+
+for _ in range(300):
+    knowledge = random_sentence(rng)
+    expected = truth_table(knowledge)
+    assert count_models(knowledge, NAMES) == len(expected), knowledge
+    found = [MODELS.index(model) for model in models(knowledge, NAMES)]
+    assert sorted(found) == sorted(expected), knowledge
+print("model counting ok")
+
+for _ in range(300):
+    sentence = random_sentence(rng)
+    parsed = parse(sentence.formula())
+    assert parsed.formula() == sentence.formula(), sentence
+    assert truth_table(parsed) == truth_table(sentence), sentence
+print("parse ok")
+
+# Assert and retract sentences at random, checking every query against
+# the truth table of whatever the knowledge base holds at that point
+for _ in range(30):
+    kb = KnowledgeBase()
+    for _ in range(20):
+        if kb.sentences and rng.random() < 0.3:
+            kb.retract(rng.choice(kb.sentences))
+        else:
+            kb.add(random_sentence(rng, 2))
+        holds = truth_table(kb.knowledge)
+        for _ in range(5):
+            query = random_sentence(rng, 2)
+            assert kb.entails(query) == (holds <= truth_table(query)), query
+        implied = kb.implied()
+        if implied is None:
+            assert not holds
+        else:
+            for name, value in implied:
+                assert all(MODELS[i][name] == value for i in holds)
+print("knowledge base ok")
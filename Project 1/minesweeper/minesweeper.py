@@ -1,5 +1,7 @@
 import itertools
+import math
 import random
+import time
 
 
 class Minesweeper():
@@ -14,25 +16,37 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Board cells are stored row by row in flat byte arrays:
+        # whether each cell is a mine, its number of neighboring mines,
+        # and whether it has been revealed
+        self.mine_map = bytearray(height * width)
+        self.counts = bytearray(height * width)
+        self.revealed = bytearray(height * width)
+
+        # Add mines randomly, counting them for their neighbors once
+        for index in random.sample(range(height * width), mines):
+            i, j = divmod(index, width)
+            self.mines.add((i, j))
+            self.mine_map[index] = 1
+            for ni in range(max(i - 1, 0), min(i + 2, height)):
+                for nj in range(max(j - 1, 0), min(j + 2, width)):
+                    if (ni, nj) != (i, j):
+                        self.counts[ni * width + nj] += 1
 
         # At first, player has found no mines
         self.mines_found = set()
 
+    @property
+    def board(self):
+        """
+        Returns the board as a list of rows of booleans, True for mines.
+        """
+        return [
+            [bool(self.mine_map[i * self.width + j])
+             for j in range(self.width)]
+            for i in range(self.height)
+        ]
+
     def print(self):
         """
         Prints a text-based representation
@@ -41,7 +55,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.mine_map[i * self.width + j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -50,7 +64,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.mine_map[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +72,37 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return self.counts[i * self.width + j]
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+    def reveal(self, cell):
+        """
+        Reveals a safe cell and returns a list of (cell, nearby mines)
+        pairs for every newly revealed cell. Revealing a cell with no
+        nearby mines also reveals its neighbors, flooding outwards
+        through all connected cells with no nearby mines.
+        """
+        if self.is_mine(cell):
+            raise Exception("Cannot reveal a mine")
+        width = self.width
+        index = cell[0] * width + cell[1]
+        if self.revealed[index]:
+            return []
+        self.revealed[index] = 1
+        revealed = [(cell, self.counts[index])]
+        stack = [cell] if not self.counts[index] else []
+        while stack:
+            i, j = stack.pop()
+            for ni in range(max(i - 1, 0), min(i + 2, self.height)):
+                for nj in range(max(j - 1, 0), min(j + 2, width)):
+                    index = ni * width + nj
+                    if self.revealed[index]:
+                        continue
+                    self.revealed[index] = 1
+                    revealed.append(((ni, nj), self.counts[index]))
+                    if not self.counts[index]:
+                        stack.append((ni, nj))
+        return revealed
 
     def won(self):
         """
@@ -143,16 +170,194 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class BitSentence():
+    """
+    Logical statement about a Minesweeper game, with its set of cells
+    encoded as the bits of an integer: cell (i, j) is bit i * width + j.
+    The mask is stored shifted down by `offset`, its lowest cell index,
+    so masks stay a few rows wide however large the board is.
+    Subset tests, differences and marking cells are integer operations.
+    """
+
+    __slots__ = ("mask", "offset", "count", "width")
+
+    def __init__(self, mask, count, width, offset=0):
+        self.mask = mask
+        self.offset = offset
+        self.count = count
+        self.width = width
+        self.normalize()
+
+    @classmethod
+    def from_cells(cls, cells, count, width):
+        mask = 0
+        for i, j in cells:
+            mask |= 1 << (i * width + j)
+        return cls(mask, count, width)
+
+    def normalize(self):
+        """
+        Shifts the mask so that its lowest bit is set.
+        """
+        if not self.mask:
+            self.offset = 0
+            return
+        shift = (self.mask & -self.mask).bit_length() - 1
+        self.mask >>= shift
+        self.offset += shift
+
+    def __eq__(self, other):
+        return self.key() == other.key()
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def __len__(self):
+        return bin(self.mask).count("1")
+
+    def key(self):
+        return (self.offset, self.mask, self.count)
+
+    def indices(self):
+        """
+        Returns the board indices of the cells in the sentence.
+        """
+        return [self.offset + index for index in bit_indices(self.mask)]
+
+    @property
+    def cells(self):
+        """
+        Returns the set of cells in the sentence.
+        """
+        return {divmod(index, self.width) for index in self.indices()}
+
+    def to_sentence(self):
+        return Sentence(self.cells, self.count)
+
+    def issubset(self, other):
+        shift = self.offset - other.offset
+        if shift < 0:
+            return not self.mask
+        return not (self.mask << shift) & ~other.mask
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells of `self` that are not in
+        `other`, assuming `other` is a subset of `self`.
+        """
+        return BitSentence(
+            self.mask & ~(other.mask << (other.offset - self.offset)),
+            self.count - other.count, self.width, self.offset
+        )
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.count == len(self):
+            return self.cells
+        return None
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        return None
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        shift = cell[0] * self.width + cell[1] - self.offset
+        if shift >= 0 and self.mask >> shift & 1:
+            self.mask ^= 1 << shift
+            self.count -= 1
+            self.normalize()
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        shift = cell[0] * self.width + cell[1] - self.offset
+        if shift >= 0 and self.mask >> shift & 1:
+            self.mask ^= 1 << shift
+            self.normalize()
+
+
+def bit_indices(mask):
+    """
+    Returns the indices of the bits set in `mask`, lowest first.
+    """
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+class CellPool():
+    """
+    Set of cells supporting O(1) insertion, removal and random sampling,
+    stored as an array whose removed entries are swapped with the last.
+    """
+
+    def __init__(self, cells=()):
+        self.cells = []
+        self.positions = dict()
+        for cell in cells:
+            self.add(cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.positions
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def add(self, cell):
+        if cell not in self.positions:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        position = self.positions.pop(cell, None)
+        if position is None:
+            return
+        last = self.cells.pop()
+        if position < len(self.cells):
+            self.cells[position] = last
+            self.positions[last] = position
+
+    def last(self):
+        return self.cells[-1]
+
+    def sample(self):
+        return self.cells[random.randrange(len(self.cells))]
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, solver_budget=None):
 
-        # Set initial height and width
+        # Set initial height and width, and the number of mines if known
         self.height = height
         self.width = width
+        self.total_mines = mines
+
+        # Seconds the global constraint solver may spend per move when
+        # sentence inference finds no safe move, or None to leave it off.
+        # The budget is wall-clock time, so moves then depend on machine load
+        self.solver_budget = solver_budget
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -161,26 +366,91 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Pools of safe cells not yet chosen, and of cells neither chosen
+        # nor known to be mines, so moves are picked without board scans
+        self.safe_moves = CellPool()
+        self.unknown = CellPool(
+            (i, j) for i in range(height) for j in range(width)
+        )
+
+        # Sentences about the game known to be true, as BitSentences keyed
+        # by (offset, cell bitmask, count) so that duplicates are merged
+        self.sentences = dict()
+
+        # Map from each cell index to the keys of the sentences mentioning it
+        self.cell_sentences = dict()
+
+        # Keys of sentences that still need to be examined for inferences
+        self.worklist = []
+
+        # Mine configuration counts of frontier components, keyed by
+        # the frozenset of sentence keys making up each component
+        self.component_cache = dict()
+
+    @property
+    def knowledge(self):
+        """
+        List of sentences about the game known to be true.
+        """
+        return [sentence.to_sentence() for sentence in self.sentences.values()]
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
+        if cell in self.mines:
+            return
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        self.unknown.discard(cell)
+        index = cell[0] * self.width + cell[1]
+        for key in list(self.cell_sentences.get(index, ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_mine(cell)
+            self.add_sentence(sentence)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell in self.safes:
+            return
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        if cell not in self.moves_made:
+            self.safe_moves.add(cell)
+        index = cell[0] * self.width + cell[1]
+        for key in list(self.cell_sentences.get(index, ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_safe(cell)
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and queues it for inference,
+        unless it is empty or already known.
+        """
+        if not sentence.mask:
+            return
+        key = sentence.key()
+        if key in self.sentences:
+            return
+        self.sentences[key] = sentence
+        for index in sentence.indices():
+            self.cell_sentences.setdefault(index, set()).add(key)
+        self.worklist.append(key)
+
+    def remove_sentence(self, key):
+        """
+        Removes a sentence from the knowledge base and returns it.
+        """
+        sentence = self.sentences.pop(key)
+        for index in sentence.indices():
+            keys = self.cell_sentences[index]
+            keys.discard(key)
+            if not keys:
+                del self.cell_sentences[index]
+        return sentence
 
     def add_knowledge(self, cell, count):
         """
@@ -198,6 +468,8 @@ class MinesweeperAI():
                if they can be inferred from existing knowledge
         """
         self.moves_made.add(cell)
+        self.unknown.discard(cell)
+        self.safe_moves.discard(cell)
         self.mark_safe(cell)
         neighbor_cells = set()
         for i in range(cell[0] - 1, cell[0] + 2):
@@ -207,54 +479,60 @@ class MinesweeperAI():
                 if (i, j) == cell:
                     continue
 
-                if 0 <= i < self.height and 0 <= j < self.width and (i, j) not in self.safes.union(self.moves_made):
+                if 0 <= i < self.height and 0 <= j < self.width and (i, j) not in self.safes:
                     if (i, j) in self.mines:
                         count -= 1
                         continue
                     neighbor_cells.add((i, j))
 
-        if len(neighbor_cells) != 0:
-            self.knowledge.append(Sentence(neighbor_cells, count))
-
-        changed = True
-        while changed:
-            changed = False
-            for sentence in self.knowledge:
-                if sentence.known_mines():
-                    changed = True
-                    mines = list(sentence.known_mines())
-                    for mine in mines:
-                        self.mark_mine(mine)
-                if sentence.known_safes() is not None:
-                    changed = True
-                    safes = list(sentence.known_safes())
-                    for safe in safes:
-                        self.mark_safe(safe)
-                if sentence.cells == set() is not None:
-                    changed = True
-                    self.knowledge.remove(sentence)
-                    continue
-                for other_sentence in self.knowledge:
-                    if other_sentence.known_mines() is not None:
-                        changed = True
-                        mines = list(other_sentence.known_mines())
-                        for mine in mines:
-                            self.mark_mine(mine)
-                    if other_sentence.known_safes() is not None:
-                        changed = True
-                        safes = list(other_sentence.known_safes())
-                        for safe in safes:
-                            self.mark_safe(safe)
-                    if other_sentence.cells == set():
-                        self.knowledge.remove(other_sentence)
-                        continue
-                    if sentence.cells.issubset(other_sentence.cells) and sentence != other_sentence:
-                        print(other_sentence, sentence)
-                        changed = True
-                        
-                        self.knowledge.append(Sentence(other_sentence.cells - sentence.cells, other_sentence.count - sentence.count))
-                        self.knowledge.remove(other_sentence)
+        self.add_sentence(
+            BitSentence.from_cells(neighbor_cells, count, self.width)
+        )
+        self.propagate()
+        if self.solver_budget and not self.safe_moves and self.sentences:
+            self.solve_frontier(self.solver_budget)
 
+    def propagate(self):
+        """
+        Draws conclusions from queued sentences until none are left.
+        Only sentences that are new or touch a changed cell are queued,
+        so each pass looks at the affected part of the knowledge base.
+        """
+        while self.worklist:
+            key = self.worklist.pop()
+            if key not in self.sentences:
+                continue
+            sentence = self.sentences[key]
+
+            # Every cell is safe, or every cell is a mine
+            safes = sentence.known_safes()
+            if safes is not None:
+                for safe in list(safes):
+                    self.mark_safe(safe)
+                continue
+            mines = sentence.known_mines()
+            if mines is not None:
+                for mine in list(mines):
+                    self.mark_mine(mine)
+                continue
+
+            # Subset inference against sentences sharing a cell
+            others = set()
+            for index in sentence.indices():
+                others.update(self.cell_sentences[index])
+            others.discard(key)
+            for other in others:
+                if key not in self.sentences:
+                    break
+                if other not in self.sentences:
+                    continue
+                other_sentence = self.sentences[other]
+                if sentence.issubset(other_sentence):
+                    self.remove_sentence(other)
+                    self.add_sentence(other_sentence.difference(sentence))
+                elif other_sentence.issubset(sentence):
+                    self.remove_sentence(key)
+                    self.add_sentence(sentence.difference(other_sentence))
 
     def make_safe_move(self):
         """
@@ -265,24 +543,348 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for safe in self.safes:
-            if safe not in self.moves_made:
-                return safe
+        if self.safe_moves:
+            return self.safe_moves.last()
         return None
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Chooses among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        picking randomly among those least likely to be a mine.
         """
-        possible_moves = []
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) not in self.moves_made and (i, j) not in self.mines:
-                    possible_moves.append((i, j))
-        if len(possible_moves) > 0:
-            move = possible_moves[random.randrange(len(possible_moves))]
-            return move
-        return None
+        if not self.unknown:
+            return None
+        if self.safe_moves:
+            return self.safe_moves.sample()
+        frontier, outside = self.frontier_probabilities()
+        outside_count = len(self.unknown) - len(frontier)
+
+        lowest = min(frontier.values(), default=1.0)
+        if outside_count:
+            lowest = min(lowest, outside)
+        possible_moves = [
+            cell for cell, p in frontier.items() if p <= lowest + 1e-12
+        ]
+        if outside_count and outside <= lowest + 1e-12:
+            choices = outside_count + len(possible_moves)
+            if random.randrange(choices) >= len(possible_moves):
+                return self.sample_outside(frontier, outside_count)
+        return possible_moves[random.randrange(len(possible_moves))]
+
+    def sample_outside(self, frontier, outside_count):
+        """
+        Returns a random unknown cell that is not on the frontier.
+        """
+        if 4 * outside_count >= len(self.unknown):
+            while True:
+                cell = self.unknown.sample()
+                if cell not in frontier:
+                    return cell
+        outside = [cell for cell in self.unknown if cell not in frontier]
+        return outside[random.randrange(len(outside))]
+
+    def mine_probabilities(self):
+        """
+        Returns a dict mapping each cell that has not been chosen and is
+        not known to be a mine to the probability that it is a mine.
+        """
+        frontier, outside = self.frontier_probabilities()
+        probabilities = {cell: outside for cell in self.unknown}
+        for cell in self.safe_moves:
+            probabilities[cell] = 0.0
+        probabilities.update(frontier)
+        return probabilities
+
+    def frontier_probabilities(self):
+        """
+        Returns a dict mapping each frontier cell (a cell mentioned by a
+        sentence) to the probability that it is a mine, and the
+        probability shared by every other unknown cell not known safe.
+
+        The frontier is split into independent components, the mine
+        configurations of each component are counted exactly, and
+        configurations are weighted by the number of ways to place the
+        remaining mines among the other unknown cells.
+        Without a known mine total, configurations are weighted equally and
+        other cells get the mean frontier probability.
+        """
+        components = [
+            self.component_configurations(component)
+            for component in self.frontier_components()
+        ]
+        probabilities = {cell: 0.0 for configurations in components
+                         for cell in configurations["cells"]}
+        outside = len(self.unknown) - len(self.safe_moves) - len(probabilities)
+
+        if self.total_mines is None:
+            for configurations in components:
+                by_mines = configurations["by_mines"]
+                total = sum(ways for ways, _ in by_mines.values())
+                for ways, counts in by_mines.values():
+                    for cell, count in zip(configurations["cells"], counts):
+                        probabilities[cell] += count / total
+            density = (sum(probabilities.values()) / len(probabilities)
+                       if probabilities else 0.5)
+            return probabilities, density
+
+        # Relative ways to place the remaining mines among the cells outside
+        # the frontier, given that the frontier holds `k` of them, computed
+        # in log space so that huge boards do not need huge integers
+        remaining = self.total_mines - len(self.mines)
+
+        def log_outside_ways(k):
+            r = remaining - k
+            if not 0 <= r <= outside:
+                return None
+            return (math.lgamma(outside + 1) - math.lgamma(r + 1)
+                    - math.lgamma(outside - r + 1))
+
+        def convolve(distributions):
+            result = {0: 1}
+            for distribution in distributions:
+                combined = dict()
+                for a, x in result.items():
+                    for b, y in distribution.items():
+                        combined[a + b] = combined.get(a + b, 0) + x * y
+                result = combined
+            return result
+
+        totals = [
+            {k: ways for k, (ways, _) in configurations["by_mines"].items()}
+            for configurations in components
+        ]
+        everything = convolve(totals)
+        logs = {k: log_outside_ways(k) for k in range(max(everything) + 1)}
+        if all(logs[k] is None for k in everything):
+            return {cell: 0.5 for cell in probabilities}, 0.5
+        scale = max(logs[k] for k in everything if logs[k] is not None)
+
+        def outside_ways(k):
+            return 0.0 if logs.get(k) is None else math.exp(logs[k] - scale)
+
+        weight = sum(ways * outside_ways(k) for k, ways in everything.items())
+        for n, configurations in enumerate(components):
+            others = convolve(totals[:n] + totals[n + 1:])
+            for k, (_, counts) in configurations["by_mines"].items():
+                factor = sum(ways * outside_ways(k + j)
+                             for j, ways in others.items())
+                for cell, count in zip(configurations["cells"], counts):
+                    probabilities[cell] += count * factor / weight
+        density = 0.0
+        if outside:
+            density = sum(
+                ways * outside_ways(k) * (remaining - k)
+                for k, ways in everything.items()
+            ) / weight / outside
+        return probabilities, density
+
+    def frontier_components(self):
+        """
+        Splits the knowledge base into groups of sentences that share
+        no cells, returned as a list of frozensets of sentence keys.
+        """
+        components = []
+        seen = set()
+        for key in self.sentences:
+            if key in seen:
+                continue
+            seen.add(key)
+            component = [key]
+            for current in component:
+                for index in self.sentences[current].indices():
+                    for other in self.cell_sentences[index]:
+                        if other not in seen:
+                            seen.add(other)
+                            component.append(other)
+            components.append(frozenset(component))
+        return components
+
+    def component_configurations(self, component, deadline=None):
+        """
+        Counts the mine configurations consistent with a component's
+        sentences, memoized across moves while the component is unchanged.
+        Raises TimeoutError if counting runs past `deadline`.
+        """
+        if component not in self.component_cache:
+            if len(self.component_cache) > 4096:
+                self.component_cache.clear()
+            self.component_cache[component] = count_configurations(
+                ((self.sentences[key].cells, self.sentences[key].count)
+                 for key in component), deadline
+            )
+        return self.component_cache[component]
+
+    def solve_frontier(self, budget=None):
+        """
+        Finds cells forced to be safe or mines by all sentences together,
+        including deductions that pairwise subset inference misses.
+
+        Each frontier component's mine configurations are enumerated, and
+        a cell is forced when it holds a mine in none or all of the
+        configurations compatible with the remaining number of mines.
+        Components that cannot be counted within `budget` seconds are
+        skipped. Returns the number of cells marked.
+        """
+        deadline = time.perf_counter() + budget if budget else None
+        components = []
+        for component in sorted(self.frontier_components(), key=len):
+            try:
+                components.append(
+                    self.component_configurations(component, deadline)
+                )
+            except TimeoutError:
+                cells = {cell for key in component
+                         for cell in self.sentences[key].cells}
+                components.append({"cells": None, "size": len(cells)})
+
+        # Possible mine totals of each component; a skipped component may
+        # hold anything from none to all of its cells
+        supports = [
+            set(range(configurations["size"] + 1))
+            if configurations["cells"] is None
+            else set(configurations["by_mines"])
+            for configurations in components
+        ]
+        frontier = sum(
+            configurations["size"] if configurations["cells"] is None
+            else len(configurations["cells"])
+            for configurations in components
+        )
+        outside = len(self.unknown) - len(self.safe_moves) - frontier
+        remaining = (self.total_mines - len(self.mines)
+                     if self.total_mines is not None else None)
+
+        def feasible(k, others):
+            if remaining is None:
+                return True
+            return any(0 <= remaining - k - j <= outside for j in others)
+
+        def sums(sets):
+            result = {0}
+            for support in sets:
+                result = {a + b for a in result for b in support}
+            return result
+
+        safes = []
+        mines = []
+        for n, configurations in enumerate(components):
+            if configurations["cells"] is None:
+                continue
+            others = sums(supports[:n] + supports[n + 1:])
+            ways = 0
+            counts = [0] * len(configurations["cells"])
+            for k, (total, cell_counts) in configurations["by_mines"].items():
+                if feasible(k, others):
+                    ways += total
+                    counts = [a + b for a, b in zip(counts, cell_counts)]
+            if not ways:
+                continue
+            for cell, count in zip(configurations["cells"], counts):
+                if count == 0:
+                    safes.append(cell)
+                elif count == ways:
+                    mines.append(cell)
+
+        # If every possible frontier total uses up the remaining mines,
+        # all other unknown cells are safe
+        totals = [k for k in sums(supports)
+                  if remaining is not None and 0 <= remaining - k <= outside]
+        if outside > 0 and totals and all(k == remaining for k in totals):
+            frontier_cells = {cell for key in self.sentences
+                              for cell in self.sentences[key].cells}
+            safes.extend(cell for cell in list(self.unknown)
+                         if cell not in frontier_cells)
+
+        for cell in safes:
+            self.mark_safe(cell)
+        for cell in mines:
+            self.mark_mine(cell)
+        self.propagate()
+        return len(safes) + len(mines)
+
+
+def count_configurations(constraints, deadline=None):
+    """
+    Counts the assignments of mines to the cells of `constraints`, an
+    iterable of (cells, count) pairs, such that every constraint holds.
+
+    Returns a dict with the ordered list of "cells" and "by_mines", which
+    maps each total number of mines k to a pair of the number of valid
+    configurations with k mines and, for each cell, how many of those
+    configurations have a mine in that cell.
+    Raises TimeoutError if still counting after time `deadline`.
+    """
+    constraints = list(constraints)
+    touching = dict()
+    for c, (cells, _) in enumerate(constraints):
+        for cell in cells:
+            touching.setdefault(cell, []).append(c)
+
+    # Order cells breadth-first through shared constraints, so each
+    # constraint is completed soon after its first cell is assigned
+    order = []
+    placed = set()
+    for start in sorted(touching):
+        if start in placed:
+            continue
+        placed.add(start)
+        queue = [start]
+        for cell in queue:
+            order.append(cell)
+            for c in touching[cell]:
+                for other in sorted(constraints[c][0]):
+                    if other not in placed:
+                        placed.add(other)
+                        queue.append(other)
+
+    n = len(order)
+    position = {cell: i for i, cell in enumerate(order)}
+    first = [min(position[cell] for cell in cells) for cells, _ in constraints]
+    last = [max(position[cell] for cell in cells) for cells, _ in constraints]
+
+    # Constraints with cells on both sides of each position
+    active = [
+        [c for c in range(len(constraints)) if first[c] < i <= last[c]]
+        for i in range(n + 1)
+    ]
+    remaining = [count for _, count in constraints]
+    unassigned = [len(cells) for cells, _ in constraints]
+    memo = dict()
+
+    def solve(i):
+        """Counts completions of cells i..n-1 given the assigned prefix."""
+        if i == n:
+            return {0: (1, [])}
+        key = (i, tuple(remaining[c] for c in active[i]))
+        if key in memo:
+            return memo[key]
+        if (deadline is not None and len(memo) % 256 == 0
+                and time.perf_counter() > deadline):
+            raise TimeoutError("configuration count ran out of time")
+        result = dict()
+        for value in (0, 1):
+            valid = True
+            for c in touching[order[i]]:
+                remaining[c] -= value
+                unassigned[c] -= 1
+                if not 0 <= remaining[c] <= unassigned[c]:
+                    valid = False
+            if valid:
+                for k, (ways, counts) in solve(i + 1).items():
+                    total, totals = result.get(k + value, (0, None))
+                    if totals is None:
+                        totals = [0] * (n - i)
+                    totals[0] += ways * value
+                    for j, count in enumerate(counts, 1):
+                        totals[j] += count
+                    result[k + value] = (total + ways, totals)
+            for c in touching[order[i]]:
+                remaining[c] += value
+                unassigned[c] += 1
+        memo[key] = result
+        return result
+
+    return {"cells": order, "by_mines": solve(0)}
@@ -8,6 +8,9 @@ HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Seconds per move for the AI's global constraint solver
+SOLVER_BUDGET = 0.05
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
@@ -37,9 +40,48 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
+# Cache font renders, which do not change between frames
+numbers = [smallFont.render(str(n), True, BLACK) for n in range(9)]
+aiText = mediumFont.render("AI Move", True, BLACK)
+resetText = mediumFont.render("Reset", True, BLACK)
+statusTexts = {
+    text: mediumFont.render(text, True, WHITE)
+    for text in ("", "Lost", "Won")
+}
+
+# Cell rectangles, and the blank cell drawn under every cell's contents
+cells = [
+    [
+        pygame.Rect(
+            board_origin[0] + j * cell_size,
+            board_origin[1] + i * cell_size,
+            cell_size, cell_size
+        )
+        for j in range(WIDTH)
+    ]
+    for i in range(HEIGHT)
+]
+blank = pygame.Surface((cell_size, cell_size))
+blank.fill(GRAY)
+pygame.draw.rect(blank, WHITE, blank.get_rect(), 3)
+
+# AI Move and Reset buttons
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+statusRect = pygame.Rect(
+    (2 / 3) * width, (2 / 3) * height - 25, width / 3, 50
+)
+
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES,
+                   solver_budget=SOLVER_BUDGET)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
@@ -49,6 +91,65 @@ lost = False
 # Show instructions initially
 instructions = True
 
+# Cells whose appearance changed since the last frame, and whether
+# the whole screen needs to be drawn again
+dirty = set()
+redraw = True
+status = None
+
+
+def cell_at(position):
+    """
+    Returns the board cell under a screen position, or None.
+    """
+    x, y = position
+    i = (y - board_origin[1]) // cell_size
+    j = (x - board_origin[0]) // cell_size
+    if 0 <= i < HEIGHT and 0 <= j < WIDTH:
+        return (i, j)
+    return None
+
+
+def draw_cell(cell):
+    """
+    Draws a single cell, and returns the rectangle that changed.
+    """
+    i, j = cell
+    rect = cells[i][j]
+    screen.blit(blank, rect)
+
+    # Add a mine, flag, or number if needed
+    if game.is_mine(cell) and lost:
+        screen.blit(mine, rect)
+    elif cell in flags:
+        screen.blit(flag, rect)
+    elif cell in revealed:
+        neighbors = numbers[game.nearby_mines(cell)]
+        neighborsTextRect = neighbors.get_rect()
+        neighborsTextRect.center = rect.center
+        screen.blit(neighbors, neighborsTextRect)
+    return rect
+
+
+def draw_button(button, text):
+    pygame.draw.rect(screen, WHITE, button)
+    buttonRect = text.get_rect()
+    buttonRect.center = button.center
+    screen.blit(text, buttonRect)
+
+
+def draw_status(text):
+    """
+    Draws the status text, and returns the rectangle that changed.
+    """
+    screen.fill(BLACK, statusRect)
+    text = statusTexts[text]
+    textRect = text.get_rect()
+    textRect.center = ((5 / 6) * width, (2 / 3) * height)
+    screen.blit(text, textRect)
+    return statusRect
+
+
 while True:
 
     # Check if game quit
@@ -56,36 +157,36 @@ while True:
         if event.type == pygame.QUIT:
             sys.exit()
 
-    screen.fill(BLACK)
-
     # Show game instructions
     if instructions:
 
-        # Title
-        title = largeFont.render("Play Minesweeper", True, WHITE)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 50)
-        screen.blit(title, titleRect)
-
-        # Rules
-        rules = [
-            "Click a cell to reveal it.",
-            "Right-click a cell to mark it as a mine.",
-            "Mark all mines successfully to win!"
-        ]
-        for i, rule in enumerate(rules):
-            line = smallFont.render(rule, True, WHITE)
-            lineRect = line.get_rect()
-            lineRect.center = ((width / 2), 150 + 30 * i)
-            screen.blit(line, lineRect)
-
         # Play game button
         buttonRect = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
-        buttonText = mediumFont.render("Play Game", True, BLACK)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = buttonRect.center
-        pygame.draw.rect(screen, WHITE, buttonRect)
-        screen.blit(buttonText, buttonTextRect)
+
+        if redraw:
+            screen.fill(BLACK)
+
+            # Title
+            title = largeFont.render("Play Minesweeper", True, WHITE)
+            titleRect = title.get_rect()
+            titleRect.center = ((width / 2), 50)
+            screen.blit(title, titleRect)
+
+            # Rules
+            rules = [
+                "Click a cell to reveal it.",
+                "Right-click a cell to mark it as a mine.",
+                "Mark all mines successfully to win!"
+            ]
+            for i, rule in enumerate(rules):
+                line = smallFont.render(rule, True, WHITE)
+                lineRect = line.get_rect()
+                lineRect.center = ((width / 2), 150 + 30 * i)
+                screen.blit(line, lineRect)
+
+            draw_button(buttonRect, mediumFont.render("Play Game", True, BLACK))
+            pygame.display.flip()
+            redraw = False
 
         # Check if play button clicked
         click, _, _ = pygame.mouse.get_pressed()
@@ -93,71 +194,32 @@ while True:
             mouse = pygame.mouse.get_pos()
             if buttonRect.collidepoint(mouse):
                 instructions = False
+                redraw = True
                 time.sleep(0.3)
-
-        pygame.display.flip()
         continue
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
-
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
+    # Draw the whole board only when needed, otherwise just what changed
+    if redraw:
+        screen.fill(BLACK)
+        for i in range(HEIGHT):
+            for j in range(WIDTH):
+                draw_cell((i, j))
+        draw_button(aiButton, aiText)
+        draw_button(resetButton, resetText)
+        status = "Lost" if lost else "Won" if game.mines == flags else ""
+        draw_status(status)
+        pygame.display.flip()
+        dirty.clear()
+        redraw = False
+    else:
+        rects = [draw_cell(cell) for cell in dirty]
+        dirty.clear()
+        text = "Lost" if lost else "Won" if game.mines == flags else ""
+        if text != status:
+            status = text
+            rects.append(draw_status(status))
+        if rects:
+            pygame.display.update(rects)
 
     move = None
 
@@ -165,15 +227,14 @@ while True:
 
     # Check for a right-click to toggle flagging
     if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
+        cell = cell_at(pygame.mouse.get_pos())
+        if cell is not None and cell not in revealed:
+            if cell in flags:
+                flags.remove(cell)
+            else:
+                flags.add(cell)
+            dirty.add(cell)
+            time.sleep(0.2)
 
     elif left == 1:
         mouse = pygame.mouse.get_pos()
@@ -184,6 +245,7 @@ while True:
             if move is None:
                 move = ai.make_random_move()
                 if move is None:
+                    dirty.update(flags ^ ai.mines)
                     flags = ai.mines.copy()
                     print("No moves left to make.")
                 else:
@@ -195,28 +257,32 @@ while True:
         # Reset game state
         elif resetButton.collidepoint(mouse):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES,
+                               solver_budget=SOLVER_BUDGET)
             revealed = set()
             flags = set()
             lost = False
+            redraw = True
             continue
 
         # User-made move
         elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
+            cell = cell_at(mouse)
+            if (cell is not None
+                    and cell not in flags
+                    and cell not in revealed):
+                move = cell
 
     # Make move and update AI knowledge
     if move:
         if game.is_mine(move):
             lost = True
+            dirty.update(game.mines)
         else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            for cell, nearby in game.reveal(move):
 
-    pygame.display.flip()
+                # Flood fill can reach flagged cells, which are safe after all
+                flags.discard(cell)
+                revealed.add(cell)
+                dirty.add(cell)
+                ai.add_knowledge(cell, nearby)
@@ -0,0 +1,142 @@
+import argparse
+import concurrent.futures
+import json
+import random
+import statistics
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper games headlessly with MinesweeperAI."
+    )
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game; game k uses seed + k")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--solver-budget", type=float, default=None,
+                        help="seconds per move for the global constraint "
+                             "solver (default: disabled); the budget is "
+                             "wall-clock time, so results then depend on "
+                             "machine load and are not reproducible")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the full report to FILE as JSON")
+    args = parser.parse_args()
+
+    report = simulate(
+        args.games, args.height, args.width, args.mines,
+        seed=args.seed, processes=args.processes,
+        solver_budget=args.solver_budget
+    )
+
+    print(f"Games: {report['games']} "
+          f"({args.height}x{args.width}, {args.mines} mines)")
+    print(f"Win rate: {report['win_rate']:.2%}")
+    print(f"Moves per second: {report['moves_per_second']:.1f}")
+    print(f"Inference time per move: "
+          f"mean {report['inference_mean'] * 1000:.3f} ms, "
+          f"max {report['inference_max'] * 1000:.3f} ms")
+    print(f"Knowledge base size: mean {report['knowledge_mean']:.1f}, "
+          f"max {report['knowledge_max']} sentences")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def simulate(games, height, width, mines, seed=0, processes=None,
+             solver_budget=None):
+    """
+    Plays `games` games across a pool of processes, game k seeding its
+    random number generator with `seed + k`, and returns a report dict.
+    """
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(
+            play, [seed + k for k in range(games)],
+            [height] * games, [width] * games, [mines] * games,
+            [solver_budget] * games,
+            chunksize=max(1, games // 64)
+        ))
+    elapsed = time.perf_counter() - start
+
+    moves = sum(result["moves"] for result in results)
+    inference = [t for result in results for t in result["inference"]]
+    sizes = [n for result in results for n in result["knowledge"]]
+
+    # Mean knowledge base size after each move, over the games still going
+    longest = max((len(result["knowledge"]) for result in results), default=0)
+    over_time = [
+        statistics.mean(
+            result["knowledge"][k] for result in results
+            if k < len(result["knowledge"])
+        )
+        for k in range(longest)
+    ]
+
+    return {
+        "games": games,
+        "wins": sum(result["won"] for result in results),
+        "win_rate": sum(result["won"] for result in results) / games,
+        "seconds": elapsed,
+        "moves": moves,
+        "moves_per_second": moves / elapsed if elapsed else 0.0,
+        "inference_mean": statistics.mean(inference) if inference else 0.0,
+        "inference_max": max(inference, default=0.0),
+        "knowledge_mean": statistics.mean(sizes) if sizes else 0.0,
+        "knowledge_max": max(sizes, default=0),
+        "knowledge_over_time": over_time,
+        "results": results
+    }
+
+
+def play(seed, height, width, mines, solver_budget=None):
+    """
+    Plays one game with the given seed and returns whether it was won,
+    the number of moves, the time spent updating the AI's knowledge for
+    each move and the knowledge base size after each move.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines,
+                       solver_budget=solver_budget or None)
+    remaining = height * width - mines
+
+    inference = []
+    knowledge = []
+    won = False
+    while True:
+        if remaining == 0:
+            won = True
+            break
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or game.is_mine(move):
+            break
+
+        elapsed = 0.0
+        for cell, nearby in game.reveal(move):
+            remaining -= 1
+            start = time.perf_counter()
+            ai.add_knowledge(cell, nearby)
+            elapsed += time.perf_counter() - start
+        inference.append(elapsed)
+        knowledge.append(len(ai.sentences))
+
+    return {
+        "seed": seed,
+        "won": won,
+        "moves": len(inference),
+        "inference": inference,
+        "knowledge": knowledge
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import itertools
+import random
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
 set1 = {2, 1, 3}
 
 set2 = {1, 2, 3}
@@ -5,4 +11,62 @@ set2 = {1, 2, 3}
 print(set1.intersection(set2))
 print(set1 - set2)
 print(set2.issubset(set1))
-print(set1 != set2)
\ No newline at end of file
+print(set1 != set2)
+
+
+# Compare the AI's mine probabilities and solver deductions on a 4x5 board
+# with brute force over every placement of the mines that fits what the AI
+# has seen so far
+HEIGHT, WIDTH, MINES = 4, 5, 4
+CELLS = [(i, j) for i in range(HEIGHT) for j in range(WIDTH)]
+NEIGHBORS = [
+    sum(1 << (ni * WIDTH + nj)
+        for ni in range(max(i - 1, 0), min(i + 2, HEIGHT))
+        for nj in range(max(j - 1, 0), min(j + 2, WIDTH))
+        if (ni, nj) != (i, j))
+    for i, j in CELLS
+]
+PLACEMENTS = [
+    sum(1 << index for index in mines)
+    for mines in itertools.combinations(range(len(CELLS)), MINES)
+]
+
+
+def brute_force(seen):
+    """
+    Returns the probability that each cell is a mine, given `seen`, a dict
+    of revealed cells to their number of neighboring mines.
+    """
+    fits = [
+        placement for placement in PLACEMENTS
+        if all(not placement >> (i * WIDTH + j) & 1
+               and bin(placement & NEIGHBORS[i * WIDTH + j]).count("1") == count
+               for (i, j), count in seen.items())
+    ]
+    return {
+        cell: sum(placement >> index & 1 for placement in fits) / len(fits)
+        for index, cell in enumerate(CELLS)
+    }
+
+
+for seed in range(20):
+    random.seed(seed)
+    game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
+    ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
+    seen = dict()
+    while len(seen) < len(CELLS) - MINES:
+        exact = brute_force(seen)
+        for cell, p in ai.mine_probabilities().items():
+            assert abs(p - exact[cell]) < 1e-9, (seed, cell, p, exact[cell])
+        ai.solve_frontier()
+        assert all(exact[cell] == 1 for cell in ai.mines), seed
+        assert all(exact[cell] == 0 for cell in ai.safes), seed
+
+        # Reveal a safe cell, choosing the AI's own move when it is safe
+        move = ai.make_safe_move() or ai.make_random_move()
+        if game.is_mine(move):
+            move = random.choice([cell for cell in CELLS if cell not in seen
+                                  and not game.is_mine(cell)])
+        seen[move] = game.nearby_mines(move)
+        ai.add_knowledge(move, seen[move])
+print("mine probabilities ok")
@@ -0,0 +1,220 @@
+import argparse
+import concurrent.futures
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import heredity
+
+
+METHODS = {
+    "elimination": heredity.variable_elimination,
+    "enumerate": heredity.enumerate_probabilities,
+    "vectorized": heredity.vectorized_probabilities
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute heredity marginals for every CSV in a directory."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file for the marginals (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv",
+                        help="one row per person as CSV or as JSON lines")
+    parser.add_argument("--method", choices=list(METHODS),
+                        default="elimination")
+    parser.add_argument("--probs", metavar="FILE",
+                        help="JSON file of probabilities to use instead "
+                             "of PROBS")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--cache", default=".heredity_cache",
+                        help="directory of results keyed by file contents "
+                             "(empty to disable)")
+    parser.add_argument("--timings", metavar="FILE",
+                        help="also write each file's timing to FILE as CSV")
+    args = parser.parse_args()
+
+    if args.probs:
+        heredity.use_probs(heredity.load_probs(args.probs))
+    filenames = sorted(glob.glob(os.path.join(args.directory, "*.csv")))
+    if not filenames:
+        sys.exit(f"No CSV files in {args.directory}")
+
+    start = time.perf_counter()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    timings = []
+    try:
+        writer = RowWriter(output, args.format)
+        results = run(filenames, args.method, args.processes, args.cache)
+        for result in results:
+            writer.write(result["rows"])
+            if result["error"]:
+                status = result["error"]
+            elif result["cached"]:
+                status = "cached"
+            else:
+                status = f"{result['seconds']:.4f}s"
+            print(f"{result['file']}: {len(result['rows'])} people, {status}",
+                  file=sys.stderr)
+            timings.append({
+                "file": result["file"],
+                "people": len(result["rows"]),
+                "seconds": result["seconds"],
+                "cached": result["cached"],
+                "error": result["error"] or ""
+            })
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if args.timings:
+        with open(args.timings, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(timings[0]))
+            writer.writeheader()
+            writer.writerows(timings)
+    print(f"{len(filenames)} files in {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
+
+
+def run(filenames, method, processes=None, cache=None):
+    """
+    Yield the result of `analyze` for each file in `filenames`, in order.
+    Files whose contents were already analyzed with the same method and
+    probabilities are read from the `cache` directory and marked
+    "cached", and files with the same contents are only analyzed once;
+    the rest run across a pool of processes.
+    """
+    keys = [content_key(filename, method) for filename in filenames]
+    done = dict()
+    pending = dict()
+    for filename, key in zip(filenames, keys):
+        if key in done or key in pending:
+            continue
+        result = cached(cache, key)
+        if result is None:
+            pending[key] = filename
+        else:
+            done[key] = dict(result, cached=True)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        processes, initializer=heredity.use_probs, initargs=(heredity.PROBS,)
+    ) as executor:
+        futures = {
+            key: executor.submit(analyze, filename, method)
+            for key, filename in pending.items()
+        }
+        for filename, key in zip(filenames, keys):
+            if key in futures:
+                result = futures.pop(key).result()
+                done[key] = result
+                if cache and not result["error"]:
+                    store(cache, key, result)
+            else:
+                result = dict(done[key])
+            result["file"] = filename
+            result["rows"] = [
+                dict(row, file=filename) for row in result["rows"]
+            ]
+            yield result
+
+
+def analyze(filename, method):
+    """
+    Compute marginals for the families in `filename` with the inference
+    method named `method`. Returns a dict with a row for each person, the
+    seconds spent and an error message, if the file could not be analyzed.
+    """
+    start = time.perf_counter()
+    try:
+        people = heredity.load_data(filename)
+        probabilities = heredity.family_probabilities(
+            people, METHODS[method], processes=1
+        )
+    except Exception as e:
+        return {"rows": [], "seconds": time.perf_counter() - start,
+                "error": f"{type(e).__name__}: {e}", "cached": False}
+
+    rows = []
+    for person, distributions in probabilities.items():
+        row = {"person": person}
+        for gene in (0, 1, 2):
+            row[f"gene_{gene}"] = distributions["gene"][gene]
+        for trait in heredity.MODEL["traits"]:
+            row[trait] = distributions[trait][True]
+        rows.append(row)
+    return {"rows": rows, "seconds": time.perf_counter() - start,
+            "error": None, "cached": False}
+
+
+def content_key(filename, method):
+    """
+    Return a hash of the contents of `filename`, the method and the
+    probabilities in use, which identifies a result in the cache.
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    digest.update(method.encode())
+    digest.update(json.dumps(heredity.PROBS, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def cached(cache, key):
+    """
+    Return the result stored in `cache` under `key`, or None.
+    """
+    if not cache:
+        return None
+    try:
+        with open(os.path.join(cache, f"{key}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store(cache, key, result):
+    """
+    Store `result` in `cache` under `key`, writing to a temporary file
+    first so that an interrupted run never leaves a partial entry.
+    """
+    os.makedirs(cache, exist_ok=True)
+    path = os.path.join(cache, f"{key}.json")
+    with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+        json.dump({"rows": result["rows"], "seconds": result["seconds"],
+                   "error": None}, f)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+class RowWriter():
+    """
+    Writes rows of marginals as CSV, with a header taken from the first
+    row, or as JSON lines.
+    """
+
+    def __init__(self, output, format):
+        self.output = output
+        self.format = format
+        self.writer = None
+
+    def write(self, rows):
+        for row in rows:
+            row = {"file": row["file"],
+                   **{k: v for k, v in row.items() if k != "file"}}
+            if self.format == "jsonl":
+                self.output.write(json.dumps(row) + "\n")
+                continue
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.output, fieldnames=list(row))
+                self.writer.writeheader()
+            self.writer.writerow(row)
+
+
+if __name__ == "__main__":
+    main()
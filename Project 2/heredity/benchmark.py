@@ -0,0 +1,115 @@
+import argparse
+import glob
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import heredity
+
+
+METHODS = {
+    "enumerate": heredity.enumerate_probabilities,
+    "elimination": heredity.variable_elimination,
+    "vectorized": heredity.vectorized_probabilities
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time heredity's exact inference methods and measure "
+                    "their peak memory on the bundled and synthetic families."
+    )
+    parser.add_argument("--sizes", type=int, nargs="*", default=[6, 8, 9],
+                        help="sizes of the synthetic families to add")
+    parser.add_argument("--methods", nargs="+", choices=list(METHODS),
+                        default=["enumerate", "elimination"])
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for generating the synthetic families")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement; the fastest is kept")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results to FILE as JSON")
+    args = parser.parse_args()
+
+    datasets = dict()
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    for filename in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        datasets[name] = heredity.load_data(filename)
+    for size in args.sizes:
+        datasets[f"synthetic{size}"] = synthetic_family(size, args.seed + size)
+
+    results = []
+    print(f"{'family':<14}{'people':>7}{'method':>13}{'seconds':>11}{'peak KiB':>11}")
+    for name, people in datasets.items():
+        for method in args.methods:
+            seconds, peak = benchmark(METHODS[method], people, args.repeat)
+            results.append({
+                "family": name,
+                "people": len(people),
+                "method": method,
+                "seconds": seconds,
+                "peak_bytes": peak
+            })
+            print(f"{name:<14}{len(people):>7}{method:>13}"
+                  f"{seconds:>11.4f}{peak / 1024:>11.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def benchmark(method, people, repeat=3):
+    """
+    Return the fastest of `repeat` runs of `method` on `people`, in
+    seconds, and the peak memory allocated during one more run, in bytes.
+    Memory is measured separately because tracing slows the run down.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        method(people)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    method(people)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def synthetic_family(size, seed=0, known=0.5):
+    """
+    Return a random family of `size` people, in the format returned by
+    `heredity.load_data`. It starts from one couple; everyone after that
+    either marries into the family or is a child of an existing couple.
+    Each person's trait is known with probability `known`.
+    """
+    rng = random.Random(seed)
+    people = dict()
+    couples = []
+    single = []
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": rng.random() < 0.3 if rng.random() < known else None
+        }
+        return name
+
+    couples.append((add(), add()))
+    while len(people) < size:
+        if single and rng.random() < 0.3:
+            partner = single.pop(rng.randrange(len(single)))
+            couples.append((partner, add()))
+        else:
+            single.append(add(*rng.choice(couples)))
+    return people
+
+
+if __name__ == "__main__":
+    main()
@@ -4,4 +4,113 @@ from heredity import *
 nums = {0, 1, 2, 3}
 test_list = [0, 8, 9, 10]
 
-print([(x in nums) for x in test_list])
\ No newline at end of file
+print([(x in nums) for x in test_list])
+
+# Marginals for the bundled families, rounded as `main` prints them
+expected = {
+    "family0": {
+        "Harry": ({2: 0.0092, 1: 0.4557, 0: 0.5351}, {True: 0.2665, False: 0.7335}),
+        "James": ({2: 0.1976, 1: 0.5106, 0: 0.2918}, {True: 1.0, False: 0.0}),
+        "Lily": ({2: 0.0036, 1: 0.0136, 0: 0.9827}, {True: 0.0, False: 1.0}),
+    },
+    "family1": {
+        "Arthur": ({2: 0.0329, 1: 0.1035, 0: 0.8636}, {True: 0.0, False: 1.0}),
+        "Charlie": ({2: 0.0018, 1: 0.1331, 0: 0.8651}, {True: 0.0, False: 1.0}),
+        "Fred": ({2: 0.0065, 1: 0.6486, 0: 0.3449}, {True: 1.0, False: 0.0}),
+        "Ginny": ({2: 0.0027, 1: 0.1805, 0: 0.8168}, {True: 0.111, False: 0.889}),
+        "Molly": ({2: 0.0329, 1: 0.1035, 0: 0.8636}, {True: 0.0, False: 1.0}),
+        "Ron": ({2: 0.0027, 1: 0.1805, 0: 0.8168}, {True: 0.111, False: 0.889}),
+    },
+    "family2": {
+        "Arthur": ({2: 0.0147, 1: 0.0344, 0: 0.9509}, {True: 0.0, False: 1.0}),
+        "Hermione": ({2: 0.0608, 1: 0.1203, 0: 0.8189}, {True: 0.0, False: 1.0}),
+        "Molly": ({2: 0.0404, 1: 0.0744, 0: 0.8852}, {True: 0.0768, False: 0.9232}),
+        "Ron": ({2: 0.0043, 1: 0.2149, 0: 0.7808}, {True: 0.0, False: 1.0}),
+        "Rose": ({2: 0.0088, 1: 0.7022, 0: 0.289}, {True: 1.0, False: 0.0}),
+    },
+}
+
+methods = [enumerate_probabilities, variable_elimination]
+try:
+    import numpy
+    methods.append(vectorized_probabilities)
+except ImportError:
+    pass
+
+for family, marginals in expected.items():
+    people = load_data(f"data/{family}.csv")
+    for method in methods:
+        probabilities = method(people)
+        for person, (genes, traits) in marginals.items():
+            for gene, p in genes.items():
+                assert round(probabilities[person]["gene"][gene], 4) == p
+            for trait, p in traits.items():
+                assert round(probabilities[person]["trait"][trait], 4) == p
+        print(family, method.__name__, "ok")
+
+
+# A long line of descent where everyone has the trait multiplies hundreds of
+# small probabilities, which underflows without log space or rescaling
+people = {
+    "0": {"name": "0", "mother": None, "father": None, "trait": True}
+}
+for i in range(1, 200):
+    people[f"{i}m"] = {"name": f"{i}m", "mother": None, "father": None, "trait": True}
+    people[f"{i}"] = {"name": f"{i}", "mother": f"{i - 1}", "father": f"{i}m", "trait": True}
+
+probabilities = variable_elimination(people)
+for person in people:
+    total = sum(probabilities[person]["gene"].values())
+    assert abs(total - 1) < 1e-9, person
+print("long line ok")
+
+small = {name: people[name] for name in ["0", "1", "1m", "2", "2m"]}
+probabilities = enumerate_probabilities(small)
+for person, distributions in variable_elimination(small).items():
+    for gene, p in distributions["gene"].items():
+        assert abs(probabilities[person]["gene"][gene] - p) < 1e-9
+print("enumeration agrees with variable elimination")
+
+
+# Sampled estimates should land near the exact ones
+people = load_data("data/family1.csv")
+exact = variable_elimination(people)
+for sampler in (likelihood_weighting, gibbs_sampling):
+    report = sampler(people, 40000, seed=1)
+    for person in people:
+        for field in ("gene", "trait"):
+            for value, p in exact[person][field].items():
+                estimate = report["probabilities"][person][field][value]
+                error = report["intervals"][person][field][value]
+                assert abs(estimate - p) <= 4 * error + 0.005, (person, value)
+    print(sampler.__name__, "ok")
+
+
+# Unrelated families are split apart and solved separately
+people = {}
+for family in ("family0", "family1"):
+    people.update(load_data(f"data/{family}.csv"))
+families = split_families(people)
+assert [sorted(family) for family in families] == [
+    sorted(load_data("data/family0.csv")), sorted(load_data("data/family1.csv"))
+]
+probabilities = family_probabilities(people, enumerate_probabilities, processes=1)
+assert probabilities == {
+    **enumerate_probabilities(families[0]), **enumerate_probabilities(families[1])
+}
+print("split families ok")
+
+
+# The derived inheritance table reproduces the old hand-written one
+child_gene = {
+    "00": [0.9801, 0.0198, 0.0001], "01": [0.495, 0.5, 0.005],
+    "02": [0.0099, 0.9802, 0.0099], "11": [0.25, 0.5, 0.25],
+    "12": [0.005, 0.5, 0.495], "22": [0.0001, 0.0198, 0.9801]
+}
+table = inheritance_table(PROBS["mutation"])
+for key, expected_genes in child_gene.items():
+    mother, father = int(key[0]), int(key[1])
+    for gene in (0, 1, 2):
+        assert abs(table[mother][father][gene] - expected_genes[gene]) < 1e-12
+        assert abs(table[father][mother][gene] - expected_genes[gene]) < 1e-12
+print("inheritance table ok")
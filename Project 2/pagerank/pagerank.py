@@ -0,0 +1,183 @@
+import os
+import random
+import re
+import sys
+
+DAMPING = 0.85
+SAMPLES = 10000
+TOLERANCE = 0.001
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python pagerank.py corpus")
+    corpus = crawl(sys.argv[1])
+    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+    ranks = iterate_pagerank(corpus, DAMPING)
+    print("PageRank Results from Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+def crawl(directory):
+    """
+    Parse a directory of HTML pages and check for links to other pages.
+    Return a dictionary where each key is a page, and values are
+    a list of all other pages in the corpus that are linked to by the page.
+    """
+    pages = dict()
+
+    # Extract all links from HTML files
+    for filename in os.listdir(directory):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            contents = f.read()
+            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            pages[filename] = set(links) - {filename}
+
+    # Only include links to other pages in the corpus
+    for filename in pages:
+        pages[filename] = set(
+            link for link in pages[filename]
+            if link in pages
+        )
+
+    return pages
+
+
+def link_graph(corpus):
+    """
+    Return the pages of `corpus` as a sorted list of names, and for each
+    page's index a tuple of the indices of the pages it links to. A page
+    with no links is left with an empty tuple rather than a link to every
+    page, so the graph stays as sparse as the corpus.
+    """
+    names = sorted(corpus)
+    index = {name: i for i, name in enumerate(names)}
+    links = [
+        tuple(sorted(index[link] for link in corpus[name] if link in index))
+        for name in names
+    ]
+    return names, links
+
+
+def incoming_links(links):
+    """
+    Return, for each page index, a list of the indices of the pages that
+    link to it. Together with each page's number of links this is the
+    sparse transition matrix read by column: page i passes 1 over its
+    number of links of its rank along each of its links.
+    """
+    incoming = [[] for _ in links]
+    for i, targets in enumerate(links):
+        for j in targets:
+            incoming[j].append(i)
+    return incoming
+
+
+def transition_model(corpus, page, damping_factor):
+    """
+    Return a probability distribution over which page to visit next,
+    given a current page.
+
+    With probability `damping_factor`, choose a link at random
+    linked to by `page`. With probability `1 - damping_factor`, choose
+    a link at random chosen from all pages in the corpus.
+    """
+    n = len(corpus)
+    links = corpus[page]
+
+    # A page with no links links to every page, itself included
+    if not links:
+        return {name: 1 / n for name in corpus}
+
+    distribution = {name: (1 - damping_factor) / n for name in corpus}
+    for link in links:
+        distribution[link] += damping_factor / len(links)
+    return distribution
+
+
+def sample_pagerank(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages
+    according to transition model, starting with a page at random.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+
+    The walk runs over page indices with its own random number
+    generator, seeded with `seed` if given.
+    """
+    names, links = link_graph(corpus)
+    if not names or n < 1:
+        return {name: 0 for name in names}
+    rng = random.Random(seed)
+    pages = len(names)
+
+    visits = [0] * pages
+    page = rng.randrange(pages)
+    visits[page] += 1
+    for _ in range(n - 1):
+        targets = links[page]
+        if targets and rng.random() < damping_factor:
+            page = targets[rng.randrange(len(targets))]
+        else:
+            page = rng.randrange(pages)
+        visits[page] += 1
+
+    return {name: visits[i] / n for i, name in enumerate(names)}
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=1000):
+    """
+    Return PageRank values for each page by iteratively updating
+    PageRank values until convergence.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+
+    Iteration stops once no value changes by more than `tolerance`, or
+    after `max_iterations` updates.
+    """
+    names, links = link_graph(corpus)
+    pages = len(names)
+    if not pages:
+        return dict()
+    incoming = incoming_links(links)
+    dangling = [i for i, targets in enumerate(links) if not targets]
+
+    ranks = [1 / pages] * pages
+    for _ in range(max_iterations):
+
+        # Pages with no links spread their rank over every page
+        base = (1 - damping_factor) / pages + damping_factor * sum(
+            ranks[i] for i in dangling
+        ) / pages
+        shares = [
+            rank / len(targets) if targets else 0
+            for rank, targets in zip(ranks, links)
+        ]
+        new_ranks = [
+            base + damping_factor * sum(map(shares.__getitem__, sources))
+            for sources in incoming
+        ]
+
+        change = max(abs(new - old) for new, old in zip(new_ranks, ranks))
+        ranks = new_ranks
+        if change <= tolerance:
+            break
+
+    # Correct for rounding so the ranks sum to 1
+    total = sum(ranks)
+    return {name: ranks[i] / total for i, name in enumerate(names)}
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
+import concurrent.futures
 import itertools
+import multiprocessing
 
 
 class Sentence():
@@ -261,3 +263,69 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def parallel_model_check(knowledge, query, processes=None, split=None):
+    """
+    Checks if knowledge base entails query, using a pool of processes.
+
+    The assignment space is split on the first `split` symbols (by
+    default enough to give each process a few subproblems), and each
+    partial assignment is checked independently. As soon as any
+    subproblem finds a model where the knowledge base is true but the
+    query is false, all other workers are told to stop.
+    On platforms that spawn processes, call this from under an
+    `if __name__ == "__main__":` guard.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    if split is None:
+        split = max(1, (4 * processes - 1).bit_length())
+    split = max(0, min(split, len(symbols)))
+    fixed, remaining = symbols[:split], symbols[split:]
+
+    stop = multiprocessing.Event()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker, initargs=(stop,)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _check_subproblem, knowledge, query, remaining,
+                dict(zip(fixed, values))
+            )
+            for values in itertools.product((True, False), repeat=split)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            if not future.result():
+                stop.set()
+                for other in futures:
+                    other.cancel()
+                return False
+    return True
+
+
+# Event shared with worker processes, set once a counterexample is found
+_stop = None
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _check_subproblem(knowledge, query, symbols, model):
+    """
+    Checks entailment over every assignment of `symbols` extending
+    `model`. Returns False on a counterexample, True otherwise (including
+    when told to stop early because another worker found one).
+    """
+    for i, values in enumerate(
+        itertools.product((True, False), repeat=len(symbols))
+    ):
+        if i % 1024 == 0 and _stop is not None and _stop.is_set():
+            return True
+        model.update(zip(symbols, values))
+        if knowledge.evaluate(model) and not query.evaluate(model):
+            return False
+    return True